@@ -2,33 +2,174 @@
 from configs import SJ, DB
 from loguru import logger
 from pandas.core.common import SettingWithCopyWarning
-from rapidfuzz import fuzz, process
+from rapidfuzz import fuzz, process, utils
 from sqlalchemy import create_engine, String, Integer, DateTime, text
-import concurrent.futures
+import asyncio
 import datetime
 import gc
+import httpx
+import io
+import json
+import numpy as np
+import orjson
 import pandas as pd
-import pangres
-import requests as r
 import sys
 import timeit
+import tzlocal
 import warnings
 
 SIMILARITY_LEVEL_OKPDTR = 75
+LOCAL_TZ = tzlocal.get_localzone_name()
+MAX_CONCURRENT_REQUESTS = 16
+HTTP_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.3
+HTTP_RETRY_STATUSES = {429, 500, 502, 503, 504}
+HTTP_TIMEOUT = 30
+VACS_CHUNKSIZE = 50_000
+
+# Поля вакансии из выдачи API SuperJob, которые выгружаются в vacs.vacancies_sj
+VACS_COLUMNS = [
+    'id', 'id_client',
+    'profession', 'candidat',
+    'work', 'compensation',
+    'education', 'experience',
+    'type_of_work', 'place_of_work',
+    'maritalstatus', 'children',
+    'gender', 'driving_licence',
+    'age_from', 'age_to',
+    'moveable', 'agreement', 'agency',
+    'town', 'payment_from',
+    'payment_to', 'currency',
+    'address', 'latitude',
+    'longitude', 'metro',
+    'link', 'date_pub_to',
+    'date_published', 'date_archived',
+    'is_closed', 'catalogues'
+]
 
 warnings.simplefilter(action="ignore", category=SettingWithCopyWarning)
 
 logger.add(
     'parser.log',
     mode='a+',
-    backtrace=True,
-    diagnose=True,
+    backtrace=False,
+    diagnose=False,
     level='DEBUG',
     encoding='utf-8',
     format="{time} - {level} - {message}"
 )
 
-def get_access_token(auth_params: dict) -> str:
+def timestamp_to_str(timestamps: pd.Series) -> pd.Series:
+    """
+    Преобразовать столбец unix-времени в строки формата "%Y-%m-%d %H:%M:%S" (локальное время).
+    
+    Параметры
+    ---------
+    timestamps : pd.Series
+        Столбец с временем в секундах от начала эпохи Unix.
+
+    Возвращаемые значения
+    ---------------------
+    pd.Series
+        Столбец строк с датой и временем; пропуски остаются пропусками.
+    """
+    return (
+        pd.to_datetime(timestamps, unit='s', utc=True)
+        .dt.tz_convert(LOCAL_TZ)
+        .dt.strftime('%Y-%m-%d %H:%M:%S')
+    )
+
+
+def copy_upsert(engine, df: pd.DataFrame, schema: str, table_name: str, if_row_exists: str) -> None:
+    """
+    Выгрузить датафрейм в таблицу PostgreSQL: COPY во временную таблицу и один INSERT ... ON CONFLICT.
+    
+    Параметры
+    ---------
+    engine : sqlalchemy.engine.Engine
+        Подключение к БД (драйвер psycopg2).
+    df : pd.DataFrame
+        Датафрейм, индекс которого совпадает с первичным ключом таблицы.
+    schema : str
+        Схема таблицы.
+    table_name : str
+        Имя таблицы.
+    if_row_exists : str
+        Поведение при конфликте по первичному ключу: "update" или "ignore".
+    """
+    keys = list(df.index.names)
+    df = df.reset_index()
+    for column in df.columns:
+        if df[column].dtype == object:
+            df[column] = df[column].map(lambda x: json.dumps(x, ensure_ascii=False) if isinstance(x, (dict, list)) else x)
+        elif df[column].dtype.kind == 'f' and (df[column].dropna() % 1 == 0).all():
+            df[column] = df[column].astype('Int64')
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, na_rep='\\N')
+    buffer.seek(0)
+
+    columns = ', '.join(f'"{column}"' for column in df.columns)
+    conflict_keys = ', '.join(f'"{key}"' for key in keys)
+    if if_row_exists == 'update':
+        conflict_action = 'DO UPDATE SET ' + ', '.join(
+            f'"{column}" = EXCLUDED."{column}"' for column in df.columns if column not in keys
+        )
+    else:
+        conflict_action = 'DO NOTHING'
+
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE staging ON COMMIT DROP AS '
+                f'SELECT {columns} FROM "{schema}"."{table_name}" WITH NO DATA'
+            )
+            cursor.copy_expert(f"COPY staging ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+            cursor.execute(
+                f'INSERT INTO "{schema}"."{table_name}" ({columns}) SELECT {columns} FROM staging '
+                f'ON CONFLICT ({conflict_keys}) {conflict_action}'
+            )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+async def get_with_retries(client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+    """
+    Выполнить GET-запрос к API SuperJob с повторами.
+    
+    Сетевые ошибки и ответы 429/5xx повторяются до HTTP_RETRIES раз с экспоненциальной задержкой.
+    
+    Параметры
+    ---------
+    client : httpx.AsyncClient
+        HTTP-клиент для запросов к API SuperJob.
+    url : str
+        Адрес метода API.
+    **kwargs
+        Параметры запроса для httpx.AsyncClient.get: headers, params.
+
+    Возвращаемые значения
+    ---------------------
+    httpx.Response
+        Успешный ответ API (статус 2xx).
+    """
+    for attempt in range(HTTP_RETRIES + 1):
+        try:
+            response = await client.get(url, **kwargs)
+            response.raise_for_status()
+            return response
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            is_retryable = (
+                isinstance(e, httpx.TransportError)
+                or e.response.status_code in HTTP_RETRY_STATUSES
+            )
+            if not is_retryable or attempt == HTTP_RETRIES:
+                raise
+            await asyncio.sleep(HTTP_BACKOFF_FACTOR * 2 ** attempt)
+
+
+async def get_access_token(auth_params: dict) -> str:
     """
     Получить токен доступа к данными API SuperJob.
     
@@ -42,22 +183,33 @@ def get_access_token(auth_params: dict) -> str:
     str
         Токен для получения информации через API SuperJob.
     """
-    response = r.get('https://api.superjob.ru/2.20/oauth2/password/', auth_params)
-    response.raise_for_status()
-    return response.json()['access_token']
+    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
+        response = await get_with_retries(client, 'https://api.superjob.ru/2.20/oauth2/password/', params=auth_params)
+    return orjson.loads(response.content)['access_token']
 
 
-def get_vacancies(access_token: str, client_secret: str, catalogues_id: int, page: int) -> list:
+async def get_vacancies(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    access_token: str,
+    client_secret: str,
+    catalogue_id: int,
+    page: int
+) -> list:
     """
-    Получить вакансии с страницы <page> выдачи API SuperJob по всем каталогам (отраслям).
+    Получить вакансии с страницы <page> выдачи API SuperJob по одному каталогу (отрасли).
     
     Параметры
     ---------
+    client : httpx.AsyncClient
+        HTTP/2-клиент, общий для всех запросов к API SuperJob.
+    semaphore : asyncio.Semaphore
+        Ограничение числа одновременных запросов к API SuperJob.
     access_token : str
         Токен для получения информации через API SuperJob.
     client_secret : str
         Ключ клиентского приложения SuperJob.
-    catalogues_id: int
+    catalogue_id: int
         ID отрасли в фильтре выдачи API.
     page: int
         Порядковый номер страницы выдачи в API SuperJob {0, ..., 4}.
@@ -67,27 +219,122 @@ def get_vacancies(access_token: str, client_secret: str, catalogues_id: int, pag
     list
         Список вакансий в формате "записей": [{...} {...}, {...}, ...].
     """
-    vacs_list = []
-    for catalogue_id in catalogues_id:
-        headers = {
-            'X-Api-App-Id': client_secret,
-            'Authorization': f'Bearer {access_token}'
-        }
-        params = {
-            'peroid':       0,
-            'town':         13,
-            'count':        100,
-            'catalogues':   catalogue_id,
-            'page':         page
-        }
-
-        response = r.get(
+    headers = {
+        'X-Api-App-Id': client_secret,
+        'Authorization': f'Bearer {access_token}'
+    }
+    params = {
+        'peroid':       0,
+        'town':         13,
+        'count':        100,
+        'catalogues':   catalogue_id,
+        'page':         page
+    }
+
+    async with semaphore:
+        response = await get_with_retries(
+            client,
             'https://api.superjob.ru/2.20/vacancies/',
             headers=headers,
             params=params
         )
-        vacs_list.extend(response.json()['objects'])
-    return vacs_list
+    return orjson.loads(response.content)['objects']
+
+
+async def get_all_vacancies(access_token: str, client_secret: str, catalogues_id: list) -> list:
+    """
+    Получить вакансии со всех страниц выдачи API SuperJob по всем каталогам (отраслям).
+    
+    Запросы выполняются конкурентно (не более MAX_CONCURRENT_REQUESTS одновременно) и мультиплексируются по HTTP/2.
+    
+    Параметры
+    ---------
+    access_token : str
+        Токен для получения информации через API SuperJob.
+    client_secret : str
+        Ключ клиентского приложения SuperJob.
+    catalogues_id: list
+        ID отраслей в фильтре выдачи API.
+
+    Возвращаемые значения
+    ---------------------
+    list
+        Список вакансий в формате "записей": [{...} {...}, {...}, ...].
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    transport = httpx.AsyncHTTPTransport(
+        http2=True,
+        limits=httpx.Limits(max_connections=MAX_CONCURRENT_REQUESTS)
+    )
+    async with httpx.AsyncClient(transport=transport, timeout=HTTP_TIMEOUT) as client:
+        results = await asyncio.gather(*[
+            get_vacancies(client, semaphore, access_token, client_secret, catalogue_id, page)
+            for catalogue_id in catalogues_id
+            for page in range(5)
+        ])
+    return [vacancy for result in results for vacancy in result]
+
+
+def build_dataframes(df: pd.DataFrame) -> tuple:
+    """
+    Сформировать отношения организации и вакансии из выдачи API SuperJob.
+    
+    Параметры
+    ---------
+    df : pd.DataFrame
+        Датафрейм вакансий в исходном формате API SuperJob.
+
+    Возвращаемые значения
+    ---------------------
+    tuple
+        Пара датафреймов (orgs_df, vacs_df) без дедупликации и индексов.
+    """
+    client_fields = (
+        'id', 'title',
+        'description', 'vacancy_count',
+        'staff_count', 'address',
+        'addresses', 'url',
+        'link', 'registered_date'
+    )
+    orgs_df = pd.DataFrame(
+        [
+            tuple(client.get(field) for field in client_fields) if isinstance(client, dict) else (None,) * len(client_fields)
+            for client in df.client
+        ],
+        columns=[
+            'id', 'name',
+            'description', 'vacancy_count',
+            'staff_count', 'main_address',
+            'addresses', 'url',
+            'link', 'registered_date'
+        ]
+    )
+    orgs_df = orgs_df.astype({'id': 'Int64', 'vacancy_count': 'Int64'})
+    orgs_df.addresses = orgs_df.addresses.where(orgs_df.addresses.notna(), None).astype('str')
+    orgs_df.registered_date = timestamp_to_str(orgs_df.registered_date)
+
+    vacs_df = df[VACS_COLUMNS]
+    for column in (
+        'education', 'experience',
+        'type_of_work', 'place_of_work',
+        'maritalstatus', 'children',
+        'gender', 'agency', 'town'
+    ):
+        vacs_df[column] = [x.get('title') if isinstance(x, dict) else None for x in vacs_df[column]]
+    vacs_df.driving_licence = [', '.join(x) if isinstance(x, list) and x else None for x in vacs_df.driving_licence]
+    vacs_df['catalogues_id'] = ['; '.join([str(d['id']) for d in x]) if isinstance(x, list) and x else None for x in vacs_df.catalogues]
+    vacs_df['catalogues_name'] = ['; '.join([d['title'] for d in x]) if isinstance(x, list) and x else None for x in vacs_df.catalogues]
+    # Нулевая зарплата в API SuperJob означает, что она не указана
+    payment_columns = ['payment_from', 'payment_to']
+    vacs_df[payment_columns] = vacs_df[payment_columns].mask(vacs_df[payment_columns] == 0)
+    vacs_df.metro = ['; '.join([d['title'] for d in x]) if isinstance(x, list) and x else None for x in vacs_df.metro]
+    vacs_df.date_pub_to = timestamp_to_str(vacs_df.date_pub_to)
+    vacs_df.date_published = timestamp_to_str(vacs_df.date_published)
+    vacs_df.date_archived = timestamp_to_str(vacs_df.date_archived)
+    vacs_df['id_mrigo'] = 23
+    vacs_df['id_okpdtr'] = None
+    vacs_df = vacs_df.astype({'payment_from': 'Int64', 'payment_to': 'Int64', 'id_okpdtr': 'Int64'})
+    return orgs_df, vacs_df
 
 
 def main():
@@ -102,7 +349,7 @@ def main():
         sys.exit(1)
     
     try:
-        access_token = get_access_token(auth_params=SJ)
+        access_token = asyncio.run(get_access_token(auth_params=SJ))
     except:
         s = 'Проблема с получение access_token'
         logger.exception(s)
@@ -124,26 +371,10 @@ def main():
             438, 471, 478,
             505, 512, 548
         ]
-        vacs_list = []
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-            result_futures = list(
-                map(
-                    lambda x: executor.submit(
-                        get_vacancies,
-                        access_token,
-                        SJ['client_secret'],
-                        catalogues_id,
-                        x
-                    ),
-                    range(5)
-                )
-            )
-        for future in concurrent.futures.as_completed(result_futures):
-            vacs_list.extend(future.result())
-        df = pd.DataFrame.from_records(vacs_list).drop_duplicates(subset=['id'])
-        df = df[df.id_client != 0]
-        df.dropna(subset=['id'], inplace=True)
+        vacs_list = asyncio.run(get_all_vacancies(access_token, SJ['client_secret'], catalogues_id))
+        df = pd.DataFrame.from_records(vacs_list, columns=VACS_COLUMNS + ['client'])
+        del vacs_list
+        df = df.loc[df.id.notna() & (df.id_client != 0) & ~df.id.duplicated()].reset_index(drop=True)
     except:
         s = 'Проблема с полученим вакансий с API SuperJob'
         logger.exception(s)
@@ -154,70 +385,15 @@ def main():
     logger.info("Данные получены с SJ")
         
     try:
-        orgs_df = df[['client', 'client_logo']]
-        orgs_df['id'] = orgs_df.client.apply(lambda x: x.get('id') if not pd.isnull(x) else None)
-        orgs_df.id = orgs_df.id.astype('Int64')
-        orgs_df['name'] = orgs_df.client.apply(lambda x: x.get('title')if not pd.isnull(x) else None)
-        orgs_df['description'] = orgs_df.client.apply(lambda x: x.get('description') if not pd.isnull(x) else None)
-        orgs_df['vacancy_count'] = orgs_df.client.apply(lambda x: x.get('vacancy_count') if not pd.isnull(x) else None)
-        orgs_df.vacancy_count = orgs_df.vacancy_count.astype('Int64')
-        orgs_df['staff_count'] = orgs_df.client.apply(lambda x: x.get('staff_count') if not pd.isnull(x) else None)
-        orgs_df['client_logo'] = orgs_df.client.apply(lambda x: x.get('client_logo') if not pd.isnull(x) else None)
-        orgs_df['main_address'] = orgs_df.client.apply(lambda x: x.get('address') if not pd.isnull(x) else None)
-        orgs_df['addresses'] = orgs_df.client.apply(lambda x: x.get('addresses') if not pd.isnull(x) else None)
-        orgs_df.addresses = orgs_df.addresses.astype('str')
-        orgs_df['url'] = orgs_df.client.apply(lambda x: x.get('url') if not pd.isnull(x) else None)
-        orgs_df['link'] = orgs_df.client.apply(lambda x: x.get('link') if not pd.isnull(x) else None)
-        orgs_df['registered_date'] = orgs_df.client.apply((lambda x: x.get('registered_date') if not pd.isnull(x) else None))
-        orgs_df.registered_date = orgs_df.registered_date.apply(lambda x: datetime.datetime.fromtimestamp(x).strftime('%Y-%m-%d %H:%M:%S') if not pd.isnull(x) else None)
-        orgs_df['download_time'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        orgs_df = orgs_df.drop(columns=['client', 'client_logo'])
+        orgs_df, vacs_df = build_dataframes(df)
+
+        download_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        orgs_df['download_time'] = download_time
         orgs_df.dropna(subset=['id'], inplace=True)
         orgs_df.drop_duplicates(subset=['id'], keep='last', inplace=True)
         orgs_df.set_index(keys='id', inplace=True)
         
-        vacs_df = df[[
-            'id', 'id_client',
-            'profession', 'candidat',
-            'work', 'compensation', 
-            'education','experience',
-            'type_of_work', 'place_of_work',
-            'maritalstatus', 'children',
-            'gender', 'driving_licence',
-            'age_from', 'age_to', 
-            'moveable', 'agreement', 'agency',
-            'town', 'payment_from',
-            'payment_to', 'currency',
-            'address', 'latitude',
-            'longitude', 'metro',
-            'link', 'date_pub_to',
-            'date_published', 'date_archived',
-            'is_closed', 'catalogues'
-        ]]
-        vacs_df.education = vacs_df.education.apply(lambda x: x.get('title') if not pd.isnull(x) else None)
-        vacs_df.experience = vacs_df.experience.apply(lambda x: x.get('title') if not pd.isnull(x) else None)
-        vacs_df.type_of_work = vacs_df.type_of_work.apply(lambda x: x.get('title') if not pd.isnull(x) else None)
-        vacs_df.place_of_work = vacs_df.place_of_work.apply(lambda x: x.get('title') if not pd.isnull(x) else None)
-        vacs_df.maritalstatus = vacs_df.maritalstatus.apply(lambda x: x.get('title') if not pd.isnull(x) else None)
-        vacs_df.children = vacs_df.children.apply(lambda x: x.get('title') if not pd.isnull(x) else None)
-        vacs_df.gender = vacs_df.gender.apply(lambda x: x.get('title') if not pd.isnull(x) else None)
-        vacs_df.driving_licence = vacs_df.driving_licence.apply(lambda x: ', '.join(x) if len(x) else None)
-        vacs_df['catalogues_id'] = vacs_df.catalogues.apply(lambda x: '; '.join([str(d['id']) for d in x]) if x else None)
-        vacs_df['catalogues_name'] = vacs_df.catalogues.apply(lambda x: '; '.join([d['title'] for d in x]) if x else None)
-        vacs_df.agency = vacs_df.agency.apply(lambda x: x.get('title') if not pd.isnull(x) else None)
-        vacs_df.town = vacs_df.town.apply(lambda x: x.get('title') if not pd.isnull(x) else None)
-        vacs_df.payment_from = vacs_df.payment_from.apply(lambda x: x if not pd.isnull(x) != 0 else None)
-        vacs_df.payment_from = vacs_df.payment_from.astype('Int64')
-        vacs_df.payment_to = vacs_df.payment_to.apply(lambda x: x if not pd.isnull(x) != 0 else None)
-        vacs_df.payment_to = vacs_df.payment_to.astype('Int64')
-        vacs_df.metro = vacs_df.metro.apply(lambda x: '; '.join([d['title'] for d in x]) if x else None)
-        vacs_df.date_pub_to = vacs_df.date_pub_to.apply(lambda x: datetime.datetime.fromtimestamp(x).strftime('%Y-%m-%d %H:%M:%S'))
-        vacs_df.date_published = vacs_df.date_published.apply(lambda x: datetime.datetime.fromtimestamp(x).strftime('%Y-%m-%d %H:%M:%S'))
-        vacs_df.date_archived = vacs_df.date_archived.apply(lambda x: datetime.datetime.fromtimestamp(x).strftime('%Y-%m-%d %H:%M:%S'))
-        vacs_df['download_time'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        vacs_df['id_mrigo'] = 23
-        vacs_df['id_okpdtr'] = None
-        vacs_df.id_okpdtr = vacs_df.id_okpdtr.astype('Int64')
+        vacs_df['download_time'] = download_time
         vacs_df.set_index(keys='id', inplace=True)
     except:
         s = 'Проблема с формированием новых датафреймов'
@@ -229,12 +405,12 @@ def main():
     logger.info("Отношения организации и вакансии сформированы")
         
     try:
-        pangres.upsert(
+        copy_upsert(
             engine=engine,
             df=orgs_df,
             schema='vacs',
             table_name='companies_sj',
-            if_row_exists='ignore',
+            if_row_exists='ignore'
         )
     except:
         s = 'Не удалось выгрузить компании'
@@ -244,12 +420,12 @@ def main():
         sys.exit(5)
     
     try:
-        pangres.upsert(
+        copy_upsert(
             engine=engine,
             df=vacs_df,
             schema='vacs',
             table_name='vacancies_sj',
-            if_row_exists='update',
+            if_row_exists='update'
         )
     except:
         s = 'Не удалось выгрузить вакансии'
@@ -268,14 +444,11 @@ def main():
         logger.warning('Очистка датафреймов: df, orgs_df, vacs_df')
     
     try:
-        vacs_db_df = pd.read_sql(
-            sql=f"select id, profession from vacs.vacancies_sj where is_matched = false",
-            con=engine
-        )
         okpdtr_db_df = pd.read_sql(
             sql=f"select id, name from data.okpdtr where code != '_'",
             con=engine
         )
+        stream_connection = engine.connect().execution_options(stream_results=True)
     except:
         s = 'Проблема с получением таблиц: vacs.vacancies_sj, data.okpdtr'
         logger.exception(s)
@@ -284,36 +457,81 @@ def main():
         sys.exit(7)
         
     try:
-        okpdtr_db_df.set_index('name', inplace=True)
-        okpdtr_dict = okpdtr_db_df.to_dict()['id']
-        vacs_db_df.set_index('id', inplace=True)
-        vacs_dict = vacs_db_df.to_dict()['profession']
-        match_list = [
-            (
-                key,
-                process.extractOne(value, okpdtr_dict.keys(), scorer=fuzz.token_set_ratio, score_cutoff=SIMILARITY_LEVEL_OKPDTR)
-            ) for key, value in vacs_dict.items()
-        ]
+        # Порядок названий - по первому вхождению, ID - последний для названия (как в dict)
+        okpdtr_id_by_name = okpdtr_db_df[okpdtr_db_df.name.notna()].groupby('name', sort=False).id.last()
+        okpdtr_choices = tuple(utils.default_process(name) for name in okpdtr_id_by_name.index)
+        okpdtr_ids = okpdtr_id_by_name.to_numpy(dtype=np.int64)
     except:
         s = 'Проблема с сопоставлением кодов ОКПДТР'
         logger.exception(s)
         with engine.begin() as connection:
             connection.execute(text("INSERT INTO vacs.sj_log (exit_point, message) VALUES (:ep, :msg)").bindparams(ep=8, msg=s))
         sys.exit(8)
+
+    params = []
+    vac_ids = []
+    # Вакансии читаются частями через серверный курсор; ошибки чтения - точка выхода 7, сопоставления - 8
+    with stream_connection:
+        try:
+            vacs_db_chunks = pd.read_sql(
+                sql=f"select id, profession from vacs.vacancies_sj where is_matched = false",
+                con=stream_connection,
+                chunksize=VACS_CHUNKSIZE
+            )
+            vacs_db_df = next(vacs_db_chunks, None)
+        except:
+            s = 'Проблема с получением таблиц: vacs.vacancies_sj, data.okpdtr'
+            logger.exception(s)
+            with engine.begin() as connection:
+                connection.execute(text("INSERT INTO vacs.sj_log (exit_point, message) VALUES (:ep, :msg)").bindparams(ep=7, msg=s))
+            sys.exit(7)
+
+        while vacs_db_df is not None:
+            try:
+                chunk_ids = vacs_db_df.id.to_numpy(dtype=np.int64)
+                # Одинаковые названия профессий сопоставляются один раз
+                codes, professions = pd.factorize(vacs_db_df.profession.fillna(''))
+                scores = process.cdist(
+                    [utils.default_process(profession) for profession in professions],
+                    okpdtr_choices,
+                    scorer=fuzz.token_set_ratio,
+                    processor=None,
+                    dtype=np.uint8,
+                    workers=-1,
+                    score_cutoff=SIMILARITY_LEVEL_OKPDTR
+                )
+                best = scores.argmax(axis=1)
+                is_match = scores[np.arange(len(professions)), best] >= SIMILARITY_LEVEL_OKPDTR
+                best, is_match = best[codes], is_match[codes]
+                params.extend(
+                    {'value': int(okpdtr_ids[okpdtr_idx]), 'key': int(vac_id)}
+                    for vac_id, okpdtr_idx in zip(chunk_ids[is_match], best[is_match])
+                )
+                vac_ids.extend(chunk_ids.tolist())
+            except:
+                s = 'Проблема с сопоставлением кодов ОКПДТР'
+                logger.exception(s)
+                with engine.begin() as connection:
+                    connection.execute(text("INSERT INTO vacs.sj_log (exit_point, message) VALUES (:ep, :msg)").bindparams(ep=8, msg=s))
+                sys.exit(8)
+
+            try:
+                vacs_db_df = next(vacs_db_chunks, None)
+            except:
+                s = 'Проблема с получением таблиц: vacs.vacancies_sj, data.okpdtr'
+                logger.exception(s)
+                with engine.begin() as connection:
+                    connection.execute(text("INSERT INTO vacs.sj_log (exit_point, message) VALUES (:ep, :msg)").bindparams(ep=7, msg=s))
+                sys.exit(7)
         
     try:
-        match_df = pd.DataFrame(match_list)
-        match_df.set_index(0, inplace=True)
-        match_df = match_df[pd.notna(match_df[1])]
-        match_df[1] = match_df[1].apply(lambda x: okpdtr_dict[x[0]])
-        match_dict = match_df.to_dict('series')
         with engine.begin() as connection:
-            for key, value in match_dict[1].items():
-                connection.execute(text("UPDATE vacs.vacancies_sj SET id_okpdtr = :value WHERE id = :key").bindparams(value=value, key=key))
-
-        with engine.begin() as connection:
-            for vac_id in vacs_dict.keys():
-                connection.execute(text("UPDATE vacs.vacancies_sj SET is_matched = true WHERE id = :key").bindparams(key=vac_id))
+            if params:
+                connection.execute(text("UPDATE vacs.vacancies_sj SET id_okpdtr = :value WHERE id = :key"), params)
+            connection.execute(
+                text("UPDATE vacs.vacancies_sj SET is_matched = true WHERE id = ANY(:ids)"),
+                {'ids': vac_ids}
+            )
     except:
         s = 'Проблема с сопоставлением кодов ОКПДТР'
         logger.exception(s)